@@ -1,9 +1,15 @@
+import functools
 import os
 from flask import Flask, jsonify, request
 from flask_limiter import Limiter
 from flask_wtf.csrf import CSRFProtect
 from flask_cors import CORS
 from dotenv import load_dotenv
+from .compression import init_compression
+from .templating import init_templating
+from .shared_state import STORE_TIMEOUT, create_shared_state
+from .profiling import PayloadSampler
+from .admission import Saturated, create_admission_controller
 
 load_dotenv()
 
@@ -44,12 +50,69 @@ def is_allowed_domain(url):
     return parsed.netloc in ALLOWED_API_DOMAINS
 
 
+@functools.lru_cache(maxsize=None)
+def get_redis_pool(storage_uri):
+    """
+    Bounded Redis connection pool for a storage URI, shared per worker.
+
+    Short timeouts make a Redis blip fail fast (into the limiter's in-memory
+    fallback, or a cache miss) instead of hanging the request.
+
+    Returns:
+        BlockingConnectionPool or None for non-Redis URIs
+    """
+    if not storage_uri.startswith(('redis://', 'rediss://')):
+        return None
+
+    import redis
+    return redis.BlockingConnectionPool.from_url(
+        storage_uri,
+        max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', 10)),
+        timeout=STORE_TIMEOUT,  # Max wait for a free connection
+        socket_connect_timeout=STORE_TIMEOUT,
+        socket_timeout=STORE_TIMEOUT,
+        health_check_interval=30,
+    )
+
+
+def get_limiter_storage_options(storage_uri):
+    """Storage options for the rate limiter (shared Redis pool, if any)"""
+    pool = get_redis_pool(storage_uri)
+    return {'connection_pool': pool} if pool else {}
+
+
+def create_limiter(storage_uri):
+    """
+    Build the rate limiter for a storage URI.
+
+    - moving-window: each decision is a single Lua script call (one RTT)
+    - in-memory fallback: approximate per-worker counting while Redis is down;
+      the primary storage is re-probed with backoff and takes over on recovery
+    """
+    return Limiter(
+        key_func=get_real_ip,
+        default_limits=[],
+        storage_uri=storage_uri,
+        storage_options=get_limiter_storage_options(storage_uri),
+        strategy='moving-window',
+        in_memory_fallback_enabled=True,
+        swallow_errors=True,
+    )
+
+
+REDIS_URL = os.environ.get('REDIS_URL', 'memory://')
+
 # Initialize rate limiter
-limiter = Limiter(
-    key_func=get_real_ip,
-    default_limits=[],
-    storage_uri=os.environ.get('REDIS_URL', 'memory://')
-)
+limiter = create_limiter(REDIS_URL)
+
+# Response cache, outbound quotas and upstream health, shared across replicas
+shared_state = create_shared_state(REDIS_URL, get_redis_pool(REDIS_URL))
+
+# Opt-in upstream payload profiling (fraction of responses, 0 = off)
+payload_sampler = PayloadSampler(float(os.environ.get('PAYLOAD_SAMPLE_RATE', 0)), shared_state)
+
+# Per-worker limit on concurrent upstream calls (global and per domain)
+admission = create_admission_controller()
 
 # Initialize CSRF protection
 csrf = CSRFProtect()
@@ -66,6 +129,13 @@ def create_app():
     # Configure CORS (allow requests from same origin)
     CORS(app, supports_credentials=True)
 
+    # Jinja bytecode cache + per-API fragment cache
+    init_templating(app)
+
+    # gzip/brotli compression and ETag/If-None-Match handling
+    # (registered first so it runs after the other after_request hooks)
+    init_compression(app)
+
     # Rate limit error handler
     @app.errorhandler(429)
     def rate_limit_handler(e):
@@ -89,6 +159,27 @@ def create_app():
         </html>
         ''', 429
 
+    @app.errorhandler(Saturated)
+    def saturated_handler(e):
+        """Shed upstream calls fast when every slot is busy"""
+        headers = {'Retry-After': str(e.retry_after)}
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
+            return jsonify({
+                'error': 'Service Busy',
+                'message': 'Too many API calls in progress. Please try again in a few seconds.'
+            }), 503, headers
+
+        return '''
+        <html>
+            <head><title>Service Busy</title></head>
+            <body style="font-family: Arial; text-align: center; padding: 2em;">
+                <h1>🚦 Service Busy</h1>
+                <p>Too many API calls in progress. Please try again in a few seconds.</p>
+                <a href="/">← Back to Home</a>
+            </body>
+        </html>
+        ''', 503, headers
+
     # Security headers
     @app.after_request
     def set_security_headers(response):
@@ -0,0 +1,118 @@
+"""
+Admission control for upstream API calls.
+
+Gunicorn runs threaded workers; only some of each worker's threads may be
+busy calling upstream APIs, so pages and /health always have threads left.
+
+- UPSTREAM_CONCURRENCY: upstream calls in flight per worker
+- UPSTREAM_CONCURRENCY_PER_DOMAIN: in flight per upstream domain, so one
+  slow API can't take every slot
+- ADMISSION_QUEUE: calls allowed to wait for a slot; beyond that they are
+  shed immediately
+- ADMISSION_WAIT: longest wait for a slot (also bounded by the deadline)
+
+Shed calls raise Saturated, which api_detail turns into a 503 with
+Retry-After.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from .metrics import metrics
+
+metrics.describe('api_looter_admission_in_flight', 'gauge', 'Upstream calls in progress')
+metrics.describe('api_looter_admission_queue_depth', 'gauge', 'Upstream calls waiting for a slot')
+metrics.describe('api_looter_admission_shed_total', 'counter', 'Upstream calls rejected with 503')
+metrics.set('api_looter_admission_in_flight', 0)
+metrics.set('api_looter_admission_queue_depth', 0)
+
+
+class Saturated(Exception):
+    """No upstream slot available; the caller should retry later"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Upstream capacity exhausted ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded global and per-domain concurrency with a short wait queue"""
+
+    def __init__(self, max_concurrent=4, per_domain=2, max_queue=2, max_wait=0.5, retry_after=2):
+        self.per_domain = per_domain
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._domain_slots = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _domain_semaphore(self, domain):
+        with self._lock:
+            if domain not in self._domain_slots:
+                self._domain_slots[domain] = threading.BoundedSemaphore(self.per_domain)
+            return self._domain_slots[domain]
+
+    def _shed(self, domain, reason):
+        metrics.inc('api_looter_admission_shed_total', {'domain': domain, 'reason': reason})
+        raise Saturated(reason, self.retry_after)
+
+    def _acquire(self, semaphore, domain, reason, deadline):
+        """Take a slot at once, or wait in the bounded queue"""
+        if semaphore.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                queue_full = True
+            else:
+                queue_full = False
+                self._waiting += 1
+        if queue_full:
+            self._shed(domain, 'queue_full')
+
+        metrics.add('api_looter_admission_queue_depth', 1)
+        try:
+            acquired = semaphore.acquire(timeout=min(self.max_wait, deadline.remaining()))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+            metrics.add('api_looter_admission_queue_depth', -1)
+        if not acquired:
+            self._shed(domain, reason)
+
+    @contextmanager
+    def admit(self, domain, deadline):
+        """
+        Hold a global and a per-domain slot for the duration of the block.
+
+        Raises:
+            Saturated: if no slot frees up in time
+        """
+        domain_slots = self._domain_semaphore(domain)
+        self._acquire(domain_slots, domain, 'domain_busy', deadline)
+        try:
+            self._acquire(self._slots, domain, 'all_busy', deadline)
+        except Saturated:
+            domain_slots.release()
+            raise
+
+        metrics.add('api_looter_admission_in_flight', 1)
+        try:
+            yield
+        finally:
+            metrics.add('api_looter_admission_in_flight', -1)
+            self._slots.release()
+            domain_slots.release()
+
+
+def create_admission_controller():
+    """Build the controller from UPSTREAM_CONCURRENCY* and ADMISSION_* settings"""
+    return AdmissionController(
+        max_concurrent=int(os.environ.get('UPSTREAM_CONCURRENCY', 4)),
+        per_domain=int(os.environ.get('UPSTREAM_CONCURRENCY_PER_DOMAIN', 2)),
+        max_queue=int(os.environ.get('ADMISSION_QUEUE', 2)),
+        max_wait=float(os.environ.get('ADMISSION_WAIT', 0.5)),
+    )
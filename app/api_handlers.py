@@ -1,17 +1,208 @@
-import json
+import socket
+import threading
+
 import requests
-from app import is_allowed_domain
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app import is_allowed_domain, payload_sampler, shared_state
+from .cassettes import CassetteMiss, create_transport
+from .deadline import Deadline, DeadlineExceeded
+from .profiling import DEFAULT_MAX_BYTES, render_json
+from .retry import call_with_policy, is_retryable
+from .shared_state import api_domain
+
+# Budget for calls made without a deadline (e.g. from profile_apis.py)
+DEFAULT_BUDGET = 10
+
+READ_CHUNK_SIZE = 16 * 1024
+
+
+def fetch(api, endpoint=None, params=None, deadline=None):
+    """
+    GET an API endpoint with the standard headers, bounded by the deadline.
+
+    Calls go through the API's retry/hedge policy ("retry" in data.py), and
+    every extra attempt counts against its outbound quota. Each attempt
+    goes through the live/record/replay transport (UPSTREAM_MODE). All
+    handlers go through here so upstream responses can also be sampled by
+    the payload profiler (PAYLOAD_SAMPLE_RATE) and counted towards the
+    domain's shared health: errors, timeouts, 429 and 5xx are failures.
+
+    Raises:
+        DeadlineExceeded: if the budget runs out before a body is read
+    """
+    deadline = deadline or Deadline(DEFAULT_BUDGET)
+    url = endpoint or api['endpoint']
+    domain = api_domain(api)
+    try:
+        response = call_with_policy(
+            api,
+            lambda attempt_deadline: transport.get(api, url, params, attempt_deadline),
+            deadline,
+            lambda: not transport.outbound or shared_state.consume_quota(api, deadline=deadline)
+        )
+    except CassetteMiss:
+        # A missing recording says nothing about the upstream's health
+        raise
+    except Exception:
+        # Not bounded by the deadline: failures usually arrive once it's spent,
+        # and recording costs at most one store timeout
+        shared_state.record_failure(domain)
+        raise
+    if is_retryable(response):
+        shared_state.record_failure(domain)
+    else:
+        shared_state.record_success(domain, deadline=deadline)
+    payload_sampler.maybe_sample(api, response)
+    return response
+
+
+# Deadline of the attempt running in this thread, picked up by its connection
+_attempt = threading.local()
+
+
+class _CancellableConnectionMixin:
+    """
+    Connection that shuts its socket down when the attempt's deadline is
+    cancelled, so a hedged call's loser stops waiting on headers or body
+    at once instead of when its read timeout expires.
+    """
+
+    def request(self, *args, **kwargs):
+        deadline = getattr(_attempt, 'deadline', None)
+        if deadline is not None:
+            deadline.on_cancel(self._abort)
+        return super().request(*args, **kwargs)
+
+    def _abort(self):
+        # Still connecting: the connect timeout (bounded by the budget) ends it
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CancellableHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+
+class _CancellableHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    """requests adapter whose connections honour Deadline.cancel()"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CancellableHTTPPool,
+            'https': _CancellableHTTPSPool,
+        }
+
+
+def get_once(url, params, deadline):
+    """
+    Make one GET, streaming the body so a trickling upstream is cut off
+    (and the connection closed) as soon as the deadline runs out or is
+    cancelled.
+    """
+    # (connect, read) timeouts bounded by the remaining budget
+    timeout = deadline.timeout()
+    _attempt.deadline = deadline
+    try:
+        with requests.Session() as session:
+            session.mount('http://', CancellableAdapter())
+            session.mount('https://', CancellableAdapter())
+            response = session.get(
+                url,
+                params=params,
+                headers={"Accept": "application/json"},
+                timeout=timeout,
+                stream=True
+            )
+    except requests.RequestException as e:
+        # Timed out or cancelled (socket shut down) once the budget was spent
+        if deadline.expired():
+            raise DeadlineExceeded(f"Request budget of {deadline.budget}s exceeded") from e
+        raise
+    finally:
+        _attempt.deadline = None
+    try:
+        chunks = []
+        while True:
+            # Each socket read may only wait for what's left of the budget
+            _limit_read_timeout(response, deadline.remaining())
+            deadline.check()
+            # read1() returns whatever arrived, so a trickle can't stall a full chunk read
+            chunk = response.raw.read1(READ_CHUNK_SIZE, decode_content=True)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        response._content = b"".join(chunks)
+        response._content_consumed = True
+    except DeadlineExceeded:
+        response.close()
+        raise
+    except Exception as e:
+        response.close()
+        # Socket timeouts cut short by the budget are deadline errors
+        if deadline.expired():
+            raise DeadlineExceeded(f"Request budget of {deadline.budget}s exceeded") from e
+        # Anything else mid-body is a broken connection (and retryable)
+        raise requests.ConnectionError(e) from e
+    response.close()
+    return response
+
+
+# Live, record or replay upstream traffic (UPSTREAM_MODE)
+transport = create_transport(get_once)
+
+
+def _limit_read_timeout(response, seconds):
+    """Shrink the socket timeout for the next body read (best effort)"""
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is not None:
+        sock.settimeout(max(seconds, 0.001))
+
+
+def truncate_body(text, max_bytes):
+    """Cut an oversized body down to max_bytes with a note on the full size"""
+    size = len(text.encode())
+    if size <= max_bytes:
+        return text
+    shown = text.encode()[:max_bytes].decode(errors="ignore")
+    return f"{shown}\n\n... truncated (showing {max_bytes:,} of {size:,} bytes)"
 
 
-def parse_response(response):
+def parse_response(response, max_bytes=DEFAULT_MAX_BYTES, deadline=None):
+    """Render a response for api_detail.html, truncating rendered text over max_bytes"""
     content_type = response.headers.get("Content-Type", "")
+    if deadline:
+        deadline.check()
+    # Too big even before pretty-printing: show the raw start without parsing it
+    if "image" not in content_type and len(response.content) > max_bytes:
+        result_type = "json" if "application/json" in content_type else "text"
+        return truncate_body(response.text, max_bytes), result_type
     if "application/json" in content_type:
         try:
             data = response.json()
             if isinstance(data, dict) and "message" in data and isinstance(data["message"], str) and data["message"].startswith("http"):
                 return data["message"], "image"
             # Serialize JSON data to ensure proper escaping
-            return json.dumps(data, indent=2), "json"
+            return truncate_body(render_json(data), max_bytes), "json"
         except Exception:
             return response.text, "text"
     elif "image" in content_type:
@@ -20,12 +211,12 @@ def parse_response(response):
         return response.text, "text"
 
 # Cat Facts API
-def handle_cat_facts_api(api, params=None):
+def handle_cat_facts_api(api, params=None, deadline=None):
     endpoint = api['endpoint']
     if not is_allowed_domain(endpoint):
         return "This API endpoint is not allowed for security reasons.", "error"
 
-    response = requests.get(endpoint, headers={"Accept": "application/json"}, timeout=10)
+    response = fetch(api, endpoint, deadline=deadline)
     try:
         data = response.json()
         # Extract the "fact" field from the response
@@ -35,13 +226,13 @@ def handle_cat_facts_api(api, params=None):
         return "Failed to parse Cat Facts API response.", "text"
 
 # Dog CEO API
-def handle_dog_ceo_api(api, params=None):
-    response = requests.get(api['endpoint'], headers={"Accept": "application/json"}, timeout=10)
-    return parse_response(response)
+def handle_dog_ceo_api(api, params=None, deadline=None):
+    response = fetch(api, deadline=deadline)
+    return parse_response(response, deadline=deadline)
 
 # DogAPI
-def handle_dog_api(api, params=None):
-    response = requests.get(api['endpoint'], headers={"Accept": "application/json"}, timeout=10)
+def handle_dog_api(api, params=None, deadline=None):
+    response = fetch(api, deadline=deadline)
     try:
         data = response.json()
         # Extract the "body" field from the first item in "data"
@@ -51,14 +242,14 @@ def handle_dog_api(api, params=None):
         return "Failed to parse DogAPI response.", "text"
 
 # JokeAPI
-def handle_jokeapi(api, params=None):
+def handle_jokeapi(api, params=None, deadline=None):
     # Extract the category from params and construct the endpoint
     params = params or {}  # Ensure params is a dictionary
     category = params.pop("category", "Any")  # Default to "Any" if no category is selected
     endpoint = f"https://v2.jokeapi.dev/joke/{category}"
 
     # Make the API request with the updated endpoint and remaining params
-    response = requests.get(endpoint, params=params, headers={"Accept": "application/json"}, timeout=10)
+    response = fetch(api, endpoint, params, deadline)
     return parse_jokeapi_response(response)
 
 def parse_jokeapi_response(response):
@@ -74,8 +265,8 @@ def parse_jokeapi_response(response):
         return response.text, "text"
 
 # Advice Slip API
-def handle_advice_slip_api(api, params=None):
-    response = requests.get(api['endpoint'], headers={"Accept": "application/json"}, timeout=10)
+def handle_advice_slip_api(api, params=None, deadline=None):
+    response = fetch(api, deadline=deadline)
     try:
         data = response.json()
         # Extract the "advice" field from the "slip" object
@@ -85,8 +276,8 @@ def handle_advice_slip_api(api, params=None):
         return "Failed to parse Advice Slip API response.", "text"
 
 # Dad Jokes API
-def handle_dad_jokes_api(api, params=None):
-    response = requests.get(api['endpoint'], headers={"Accept": "application/json"}, timeout=10)
+def handle_dad_jokes_api(api, params=None, deadline=None):
+    response = fetch(api, deadline=deadline)
     try:
         data = response.json()
         # Extract the "joke" field from the response
@@ -96,8 +287,8 @@ def handle_dad_jokes_api(api, params=None):
         return "Failed to parse Dad Jokes API response.", "text"
 
 # Kanye Rest API
-def handle_kanye_rest_api(api, params=None):
-    response = requests.get(api['endpoint'], headers={"Accept": "application/json"}, timeout=10)
+def handle_kanye_rest_api(api, params=None, deadline=None):
+    response = fetch(api, deadline=deadline)
     try:
         data = response.json()
         # Extract the "quote" field from the response
@@ -107,11 +298,11 @@ def handle_kanye_rest_api(api, params=None):
         return "Failed to parse Kanye Rest API response.", "text"
 
 # Default handler for APIs without custom handlers
-def handle_default_api(api, params=None):
+def handle_default_api(api, params=None, deadline=None):
     endpoint = api['endpoint']
     # SSRF Protection: Check if domain is whitelisted
     if not is_allowed_domain(endpoint):
         return "This API endpoint is not allowed for security reasons.", "error"
 
-    response = requests.get(endpoint, params=params, headers={"Accept": "application/json"}, timeout=10)
-    return parse_response(response)
+    response = fetch(api, endpoint, params, deadline)
+    return parse_response(response, api.get('max_bytes', DEFAULT_MAX_BYTES), deadline)
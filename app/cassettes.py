@@ -0,0 +1,180 @@
+"""
+Record/replay transport for upstream traffic.
+
+UPSTREAM_MODE selects how fetch() reaches upstream APIs:
+
+    live     call the real API (default)
+    record   call the real API and append each exchange to a cassette
+    replay   serve recorded exchanges only, with no network access
+
+Cassettes are JSON-lines files, one per API (CASSETTE_DIR/api_<id>.jsonl),
+indexed in memory by (api id, hash of URL + params). When a key has several
+recordings (random APIs), replay cycles through them in order.
+
+REPLAY_LATENCY scales the recorded upstream latency during replay:
+0 (default) answers immediately, 1 reproduces production timings and still
+honours the request deadline.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .deadline import DeadlineExceeded
+from .shared_state import params_hash
+
+DEFAULT_CASSETTE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cassettes')
+
+MODES = ('live', 'record', 'replay')
+
+
+class CassetteMiss(Exception):
+    """No recording for a request in replay mode"""
+
+
+def exchange_key(url, params):
+    return params_hash({'url': url, 'params': params or {}})
+
+
+def encode_body(body):
+    """Bodies are stored as text when possible, base64 otherwise"""
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_b64': base64.b64encode(body).decode()}
+
+
+def decode_body(entry):
+    if 'body_b64' in entry:
+        return base64.b64decode(entry['body_b64'])
+    return entry['body'].encode('utf-8')
+
+
+class Cassettes:
+    """On-disk exchanges for every API, loaded lazily per API"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._index = {}
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def path(self, api_id):
+        return os.path.join(self.directory, f'api_{api_id}.jsonl')
+
+    def _load(self, api_id):
+        """Index one API's cassette by exchange key (called with the lock held)"""
+        if api_id in self._index:
+            return self._index[api_id]
+        index = {}
+        try:
+            with open(self.path(api_id), encoding='utf-8') as cassette:
+                for line in cassette:
+                    if line.strip():
+                        entry = json.loads(line)
+                        index.setdefault(entry['key'], []).append(entry)
+        except FileNotFoundError:
+            pass
+        self._index[api_id] = index
+        return index
+
+    def find(self, api_id, key):
+        """Next recording for a key, cycling through repeats"""
+        with self._lock:
+            entries = self._load(api_id).get(key)
+            if not entries:
+                return None
+            position = self._positions.get((api_id, key), 0)
+            self._positions[(api_id, key)] = position + 1
+            return entries[position % len(entries)]
+
+    def append(self, api_id, entry):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(api_id), 'a', encoding='utf-8') as cassette:
+                cassette.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._load(api_id).setdefault(entry['key'], []).append(entry)
+
+
+def build_response(url, params, entry):
+    """Rebuild a requests.Response from a recorded exchange"""
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+    response.url = requests.Request('GET', url, params=params).prepare().url
+    response._content = decode_body(entry)
+    response._content_consumed = True
+    return response
+
+
+class Transport:
+    """
+    Routes upstream GETs to the network, a recorder or a replayer.
+
+    Args:
+        live_get (callable): get_once(url, params, deadline) for real calls
+        mode (str): live, record or replay
+        cassettes (Cassettes): cassette store for record/replay
+        replay_latency (float): Multiplier for recorded latency on replay
+    """
+
+    def __init__(self, live_get, mode='live', cassettes=None, replay_latency=0.0):
+        if mode not in MODES:
+            raise ValueError(f"UPSTREAM_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+        self.live_get = live_get
+        self.mode = mode
+        self.cassettes = cassettes
+        self.replay_latency = replay_latency
+
+    @property
+    def outbound(self):
+        """Whether calls reach real upstreams (and so count against quotas)"""
+        return self.mode != 'replay'
+
+    def get(self, api, url, params, deadline):
+        if self.mode == 'replay':
+            return self._replay(api, url, params, deadline)
+        if self.mode == 'record':
+            return self._record(api, url, params, deadline)
+        return self.live_get(url, params, deadline)
+
+    def _record(self, api, url, params, deadline):
+        started = time.monotonic()
+        response = self.live_get(url, params, deadline)
+        entry = {
+            'key': exchange_key(url, params),
+            'url': url,
+            'params': params or {},
+            'status': response.status_code,
+            'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+            'latency': round(time.monotonic() - started, 3),
+        }
+        entry.update(encode_body(response.content))
+        self.cassettes.append(api['id'], entry)
+        return response
+
+    def _replay(self, api, url, params, deadline):
+        entry = self.cassettes.find(api['id'], exchange_key(url, params))
+        if entry is None:
+            raise CassetteMiss(f"No recording for API {api['id']} {url} {params or {}}")
+
+        delay = entry.get('latency', 0) * self.replay_latency
+        if delay:
+            remaining = deadline.remaining()
+            time.sleep(min(delay, remaining))
+            if delay > remaining:
+                raise DeadlineExceeded(f"Request budget of {deadline.budget}s exceeded")
+        return build_response(url, params, entry)
+
+
+def create_transport(live_get):
+    """Build the transport from UPSTREAM_MODE, CASSETTE_DIR and REPLAY_LATENCY"""
+    mode = os.environ.get('UPSTREAM_MODE', 'live')
+    cassettes = Cassettes(os.environ.get('CASSETTE_DIR', DEFAULT_CASSETTE_DIR))
+    replay_latency = float(os.environ.get('REPLAY_LATENCY', 0))
+    return Transport(live_get, mode, cassettes, replay_latency)
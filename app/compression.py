@@ -0,0 +1,165 @@
+"""
+Response compression and conditional-GET support.
+
+Negotiates brotli/gzip from Accept-Encoding, tags cacheable GET responses
+with an ETag and answers matching If-None-Match requests with 304.
+Brotli is only offered when the optional `brotli` package is installed.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Static files (CSS/JS) are served with direct_passthrough and skipped, so
+# only dynamic responses are listed here
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/plain',
+    'application/json',
+}
+
+
+class CompressedBodyCache:
+    """Small thread-safe LRU of compressed bodies keyed by (etag, encoding)"""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def available_encodings():
+    """Encodings we can produce, in order of preference"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_body(data, encoding, level):
+    """Compress raw bytes with the given content-coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    # mtime=0 keeps output deterministic so cached bodies match fresh ones
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _is_cacheable(request, response):
+    """Only successful GET/HEAD responses without no-store get an ETag"""
+    return (
+        request.method in ('GET', 'HEAD')
+        and response.status_code == 200
+        and not response.cache_control.no_store
+    )
+
+
+def _should_skip(response):
+    """Streams, empty/informational responses and non-text bodies pass through"""
+    return (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def _etag_or_304(request, response, data, encoding):
+    """
+    Tag a cacheable response and turn it into a 304 if the client has it.
+
+    Returns:
+        tuple: (etag, base_etag, not_modified); etags are None if not cacheable
+    """
+    if not _is_cacheable(request, response):
+        return None, None, False
+
+    base_etag = hashlib.sha1(data, usedforsecurity=False).hexdigest()
+    # Each representation gets its own strong validator
+    etag = f'{base_etag}-{encoding}' if encoding else base_etag
+    response.set_etag(etag)
+    # The plain validator identifies the same content, so accept either
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(base_etag):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        return etag, base_etag, True
+    return etag, base_etag, False
+
+
+def _encode(response, data, encoding, level, cache, etag, base_etag):
+    """Replace the body with its compressed form (cached per ETag)"""
+    compressed = cache.get((etag, encoding)) if etag else None
+    if compressed is None:
+        compressed = compress_body(data, encoding, level)
+        if etag:
+            cache.set((etag, encoding), compressed)
+
+    # Not worth it when compression didn't actually save anything
+    if len(compressed) >= len(data):
+        if etag:
+            response.set_etag(base_etag)
+        return
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+
+def init_compression(app, cache=None):
+    """
+    Register the compression/ETag after_request hook on the app.
+
+    Config:
+        COMPRESS_MIN_SIZE (int): Bodies smaller than this are sent as-is
+        COMPRESS_LEVEL (int): gzip level / brotli quality
+        COMPRESS_CACHE_SIZE (int): Compressed bodies kept per worker
+    """
+    from flask import request
+
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_CACHE_SIZE', 128)
+
+    if cache is None:
+        cache = CompressedBodyCache(app.config['COMPRESS_CACHE_SIZE'])
+    app.extensions['compression_cache'] = cache
+
+    @app.after_request
+    def compress_response(response):
+        """Add ETag, handle If-None-Match and compress the body"""
+        if _should_skip(response):
+            return response
+
+        data = response.get_data()
+        encoding = None
+        if len(data) >= app.config['COMPRESS_MIN_SIZE']:
+            encoding = request.accept_encodings.best_match(available_encodings())
+            response.vary.add('Accept-Encoding')
+
+        etag, base_etag, not_modified = _etag_or_304(request, response, data, encoding)
+        if not_modified or encoding is None:
+            return response
+
+        _encode(response, data, encoding, app.config['COMPRESS_LEVEL'], cache, etag, base_etag)
+        return response
+
+    return compress_response
@@ -1,6 +1,14 @@
 """
 Static API data structure for api_looter.
 No database needed - all API information stored here.
+
+Optional per-API fields:
+    cache_ttl (int): Seconds to cache results in the shared response cache
+    quota (str): Outbound call quota shared by all workers, e.g. "100 per day"
+    max_bytes (int): Larger responses are truncated instead of rendered in full
+                     (default 200,000; see profile_apis.py for suggestions)
+    retry (dict): Retry/hedge policy for flaky upstreams, see app/retry.py
+                  e.g. {"attempts": 3, "backoff": 0.2, "hedge": True}
 """
 
 APIS = [
@@ -53,6 +61,7 @@ APIS = [
         "how_use": "Returns motivational advice - great for learning apps, bots, or daily inspiration features.",
         "category": "Fun",
         "has_handler": True,
+        "retry": {"attempts": 3, "backoff": 0.2, "hedge": True},
         "is_adult": True,
         "adult_warning": "This API may contain advice with adult language or mature themes."
     },
@@ -134,6 +143,8 @@ APIS = [
         "how_use": "Used in crypto portfolio trackers, price alert apps, and trading dashboards. No API key required for basic usage.",
         "category": "Cryptocurrency",
         "has_handler": False,
+        "cache_ttl": 30,
+        "quota": "10 per minute",
         "is_adult": False
     },
     {
@@ -148,6 +159,8 @@ APIS = [
         "how_use": "Useful for data analysis, user profiling, and demographic research. Returns gender probability scores.",
         "category": "Data",
         "has_handler": False,
+        "cache_ttl": 86400,
+        "quota": "100 per day",
         "is_adult": False
     },
     {
@@ -162,6 +175,8 @@ APIS = [
         "how_use": "Used in demographic analysis, marketing research, and data enrichment tools.",
         "category": "Data",
         "has_handler": False,
+        "cache_ttl": 86400,
+        "quota": "100 per day",
         "is_adult": False
     },
     {
@@ -176,6 +191,8 @@ APIS = [
         "how_use": "Helps with internationalization, market research, and understanding name origins. Returns multiple country probabilities.",
         "category": "Data",
         "has_handler": False,
+        "cache_ttl": 86400,
+        "quota": "100 per day",
         "is_adult": False
     },
     {
@@ -188,6 +205,7 @@ APIS = [
         "how_use": "Great for pet apps, educational content, or practicing JSON parsing with complex structures.",
         "category": "Fun",
         "has_handler": False,
+        "retry": {"attempts": 3, "backoff": 0.2, "hedge": True},
         "is_adult": False
     },
     {
@@ -200,6 +218,7 @@ APIS = [
         "how_use": "Fun facts for educational apps, trivia games, or daily number facts. Returns plain text instead of JSON.",
         "category": "Fun",
         "has_handler": False,
+        "retry": {"attempts": 3, "backoff": 0.2, "hedge": True},
         "is_adult": False
     },
     {
@@ -214,6 +233,8 @@ APIS = [
         "how_use": "Essential for book apps, library systems, reading trackers, and educational projects. Free and extensive book database.",
         "category": "Data",
         "has_handler": False,
+        "cache_ttl": 3600,
+        "max_bytes": 50000,
         "is_adult": False
     },
     {
@@ -0,0 +1,80 @@
+"""
+Per-request deadline.
+
+api_detail creates one Deadline per POST and passes it down through handler
+dispatch, fetch() and parsing, so a slow or trickling upstream can hold a
+worker thread for at most the request budget. Gunicorn's --timeout doesn't
+cover request threads in gthread workers, so this is the only per-request bound.
+"""
+
+import threading
+import time
+
+# Cap on the connect phase, so the read phase always gets some budget
+CONNECT_TIMEOUT = 3.05
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request budget runs out"""
+
+
+class Deadline:
+    """Fixed point in time by which the current request must be done"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+        self._cancelled = False
+        self._on_cancel = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise DeadlineExceeded if the budget is used up"""
+        if self.expired():
+            raise DeadlineExceeded(f"Request budget of {self.budget}s exceeded")
+
+    def child(self):
+        """Deadline with the same expiry that can be cancelled on its own"""
+        child = Deadline(self.budget)
+        child.started_at = self.started_at
+        child.expires_at = self.expires_at
+        return child
+
+    def cancel(self):
+        """Expire now and run the on_cancel callbacks (e.g. close sockets)"""
+        self.expires_at = time.monotonic()
+        with self._lock:
+            self._cancelled = True
+            callbacks, self._on_cancel = self._on_cancel, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Run callback when cancel() is called (at once if it already was)"""
+        with self._lock:
+            if not self._cancelled:
+                self._on_cancel.append(callback)
+                return
+        callback()
+
+    def timeout(self):
+        """
+        (connect, read) timeout for requests, bounded by the remaining budget.
+
+        Raises:
+            DeadlineExceeded: if there is no budget left to start a call
+        """
+        self.check()
+        remaining = self.remaining()
+        return (min(remaining, CONNECT_TIMEOUT), remaining)
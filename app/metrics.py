@@ -0,0 +1,97 @@
+"""
+Minimal in-process metrics in Prometheus text format.
+
+Metrics are per worker process (each sample carries a `pid` label), served
+at /metrics when METRICS_TOKEN is set.
+"""
+
+import os
+import threading
+
+# Histogram buckets in seconds (request budgets are a few seconds)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+
+
+def _labels(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = [('pid', str(os.getpid()))] + list(labels) + list(extra)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def add(self, name, amount, labels=None):
+        """Adjust a gauge up or down"""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                key, {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            )
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        described = set()
+
+        def header(name):
+            if name in self._help and name not in described:
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                described.add(name)
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name)
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+            for (name, labels), value in sorted(self._gauges.items()):
+                header(name)
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                header(name)
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]:.6f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+metrics.describe('api_looter_upstream_seconds', 'histogram', 'Time spent calling the upstream API')
+metrics.describe('api_looter_budget_remaining_seconds', 'histogram', 'Request budget left when an API call finished')
+metrics.describe('api_looter_deadline_exceeded_total', 'counter', 'API calls cut off by the request budget')
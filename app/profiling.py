@@ -0,0 +1,184 @@
+"""
+Upstream payload profiling.
+
+Measures each upstream response (size, parse time, JSON depth and a
+fingerprint of its key shape) and turns a set of samples into per-API
+limit suggestions for app/data.py.
+
+Used by profile_apis.py, and at runtime when PAYLOAD_SAMPLE_RATE > 0.
+"""
+
+import hashlib
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Rendered results bigger than this are truncated on api_detail.html, unless
+# the API sets "max_bytes" in data.py. The profiler flags APIs against it.
+DEFAULT_MAX_BYTES = 50_000
+
+
+def render_json(data):
+    """JSON exactly as api_detail.html shows it (pretty-printed)"""
+    return json.dumps(data, indent=2)
+
+
+def json_depth(data):
+    """Nesting depth of a parsed JSON value (scalars are depth 0)"""
+    if isinstance(data, dict):
+        return 1 + max((json_depth(value) for value in data.values()), default=0)
+    if isinstance(data, list):
+        return 1 + max((json_depth(value) for value in data), default=0)
+    return 0
+
+
+def shape(data):
+    """
+    Key shape of a JSON value, ignoring the values themselves.
+
+    Lists are described by their first item, so a search result with 3 or
+    300 docs has the same shape.
+    """
+    if isinstance(data, dict):
+        return {key: shape(data[key]) for key in sorted(data)}
+    if isinstance(data, list):
+        return [shape(data[0])] if data else []
+    return type(data).__name__
+
+
+def shape_fingerprint(data):
+    """Short stable hash of a JSON value's key shape"""
+    encoded = json.dumps(shape(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def profile_response(response):
+    """
+    Profile one upstream response.
+
+    Returns:
+        dict: size, rendered_size, status, content_type, parse_ms, depth,
+              fingerprint, body_hash
+    """
+    body = response.content
+    sample = {
+        'size': len(body),
+        'rendered_size': len(body),
+        'status': response.status_code,
+        'content_type': response.headers.get('Content-Type', '').split(';')[0],
+        'parse_ms': None,
+        'depth': None,
+        'fingerprint': None,
+        'body_hash': hashlib.sha1(body, usedforsecurity=False).hexdigest()[:12],
+    }
+    if 'json' in sample['content_type']:
+        start = time.perf_counter()
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return sample
+        sample['parse_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        sample['rendered_size'] = len(render_json(data).encode())
+        sample['depth'] = json_depth(data)
+        sample['fingerprint'] = shape_fingerprint(data)
+    return sample
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Summarize samples for one API and suggest data.py limits.
+
+    Returns:
+        dict: size/parse/depth stats, shape count, flags and suggestions
+    """
+    sizes = [sample['size'] for sample in samples]
+    # Samples recorded before rendered_size existed fall back to the raw size
+    rendered = [sample.get('rendered_size', sample['size']) for sample in samples]
+    parse_times = [sample['parse_ms'] for sample in samples if sample.get('parse_ms') is not None]
+    depths = [sample['depth'] for sample in samples if sample.get('depth') is not None]
+    fingerprints = {sample['fingerprint'] for sample in samples if sample.get('fingerprint')}
+    bodies = {sample['body_hash'] for sample in samples}
+
+    summary = {
+        'samples': len(samples),
+        'size_p50': percentile(sizes, 50),
+        'size_p95': percentile(sizes, 95),
+        'size_max': max(sizes),
+        'rendered_p95': percentile(rendered, 95),
+        'parse_ms_p50': statistics.median(parse_times) if parse_times else None,
+        'parse_ms_p95': percentile(parse_times, 95) if parse_times else None,
+        'depth_max': max(depths) if depths else None,
+        'shapes': len(fingerprints),
+        'flags': [],
+        'suggestions': {},
+    }
+
+    if summary['rendered_p95'] > DEFAULT_MAX_BYTES:
+        summary['flags'].append(f'rendered results over {DEFAULT_MAX_BYTES:,} bytes are truncated')
+    if len(fingerprints) > 1:
+        summary['flags'].append(f'{len(fingerprints)} response shapes')
+
+    # Identical bodies across samples means results are safe to cache
+    if len(samples) > 1 and len(bodies) == 1:
+        summary['suggestions']['cache_ttl'] = 3600
+    elif summary['parse_ms_p95'] is not None and summary['size_p50'] > DEFAULT_MAX_BYTES:
+        summary['suggestions']['cache_ttl'] = 300
+
+    return summary
+
+
+class PayloadSampler:
+    """
+    Opt-in runtime sampler: profiles a random fraction of upstream responses
+    and stores them in the shared state for profile_apis.py --recorded.
+
+    Profiling re-parses the body and storing may wait on Redis, so both run
+    on one background thread, never on the request thread. Samples are
+    dropped while MAX_PENDING are already queued.
+    """
+
+    MAX_PENDING = 16
+
+    def __init__(self, rate, shared_state):
+        self.rate = rate
+        self.shared_state = shared_state
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def maybe_sample(self, api, response):
+        if self.rate <= 0 or random.random() >= self.rate:
+            return
+        with self._lock:
+            if self._pending >= self.MAX_PENDING:
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='payload-sampler')
+        self._executor.submit(self._record, api['id'], response)
+
+    def _record(self, api_id, response):
+        try:
+            sample = profile_response(response)
+            sample['at'] = int(time.time())
+            self.shared_state.record_sample(api_id, sample)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def flush(self):
+        """Wait until every queued sample is stored"""
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
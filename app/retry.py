@@ -0,0 +1,190 @@
+"""
+Retry and hedging policy for idempotent upstream GETs.
+
+Configured per API in app/data.py:
+
+    "retry": {"attempts": 3, "backoff": 0.2, "hedge": True}
+
+- attempts: total tries, retrying connection errors, timeouts, 429 and 5xx
+- backoff: base delay in seconds, exponential with full jitter
+- hedge: if the first try is slower than this API's observed p95, fire a
+  second one and take whichever answers first
+
+Every retry and hedge counts against the API's outbound quota and must fit
+in the request deadline, so the policy can never overrun either.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from .deadline import DeadlineExceeded
+from .metrics import metrics
+
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+# Latencies kept per API for the hedging threshold, and the minimum
+# number needed before we trust the p95
+LATENCY_WINDOW = 100
+LATENCY_MIN_SAMPLES = 20
+
+MAX_BACKOFF = 1.0
+
+# Never hedge sooner than this; below it a second request only adds load
+MIN_HEDGE_DELAY = 0.1
+
+# Hedged calls run in a per-worker pool with room for a primary and a hedge
+# for every admitted upstream call (see app/admission.py)
+_executor = ThreadPoolExecutor(
+    max_workers=2 * int(os.environ.get('UPSTREAM_CONCURRENCY', 4)),
+    thread_name_prefix='hedge',
+)
+
+metrics.describe('api_looter_retries_total', 'counter', 'Upstream calls retried after a failure')
+metrics.describe('api_looter_hedges_total', 'counter', 'Hedged upstream calls fired')
+metrics.describe('api_looter_hedge_wins_total', 'counter', 'Hedged upstream calls that answered first')
+
+
+class RetryPolicy:
+    """Retry/hedge settings for one API"""
+
+    def __init__(self, attempts=1, backoff=0.1, hedge=False):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.hedge = hedge
+
+    @classmethod
+    def for_api(cls, api):
+        return cls(**api.get('retry', {}))
+
+    def delay(self, retry_number):
+        """Full-jitter exponential backoff before retry N (1-based)"""
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** (retry_number - 1)))
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per API"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, api_id, seconds):
+        with self._lock:
+            self._latencies.setdefault(api_id, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, api_id):
+        """Observed p95 in seconds, or None until there are enough samples"""
+        with self._lock:
+            samples = sorted(self._latencies.get(api_id, ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+latencies = LatencyTracker()
+
+
+def is_retryable(response):
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _timed(api, attempt, deadline):
+    """Run one attempt and record its latency if the upstream answered"""
+    started = time.monotonic()
+    response = attempt(deadline)
+    if not is_retryable(response):
+        latencies.record(api['id'], time.monotonic() - started)
+    return response
+
+
+def _hedged(api, attempt, deadline, allow_extra_call):
+    """Fire a second attempt if the first outlives the observed p95"""
+    p95 = latencies.p95(api['id'])
+    if p95 is None or p95 >= deadline.remaining():
+        return _timed(api, attempt, deadline)
+    hedge_delay = max(p95, MIN_HEDGE_DELAY)
+
+    attempts = {}
+    primary_deadline = deadline.child()
+    attempts[_executor.submit(_timed, api, attempt, primary_deadline)] = primary_deadline
+
+    hedge = None
+    done, _ = wait(attempts, timeout=min(hedge_delay, deadline.remaining()))
+    if not done and allow_extra_call():
+        metrics.inc('api_looter_hedges_total', {'api': api['id']})
+        hedge_deadline = deadline.child()
+        hedge = _executor.submit(_timed, api, attempt, hedge_deadline)
+        attempts[hedge] = hedge_deadline
+
+    error = None
+    while attempts:
+        # Bounded by the deadline even if the pool is busy or a call is stuck
+        done, _ = wait(attempts, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            for attempt_deadline in attempts.values():
+                attempt_deadline.cancel()
+            raise DeadlineExceeded(f"Request budget of {deadline.budget}s exceeded")
+        for future in done:
+            attempts.pop(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            # First answer wins; cancelling shuts the other attempt's socket down
+            for other_deadline in attempts.values():
+                other_deadline.cancel()
+            if future is hedge:
+                metrics.inc('api_looter_hedge_wins_total', {'api': api['id']})
+            return response
+    raise error
+
+
+def call_with_policy(api, attempt, deadline, allow_extra_call):
+    """
+    Run attempt(deadline) under the API's retry/hedge policy.
+
+    Args:
+        api (dict): API entry (policy from its "retry" field)
+        attempt (callable): Makes one upstream call, returns a response
+        deadline (Deadline): Request deadline every attempt must fit in
+        allow_extra_call (callable): Returns False when the outbound quota
+                                     has no room for another call
+
+    Returns:
+        requests.Response: first good response, or the last one received
+    """
+    policy = RetryPolicy.for_api(api)
+    last_response, last_error = None, None
+
+    for try_number in range(policy.attempts):
+        if try_number > 0:
+            delay = policy.delay(try_number)
+            if delay >= deadline.remaining() or not allow_extra_call():
+                break
+            metrics.inc('api_looter_retries_total', {'api': api['id']})
+            time.sleep(delay)
+
+        try:
+            if policy.hedge:
+                response = _hedged(api, attempt, deadline, allow_extra_call)
+            else:
+                response = _timed(api, attempt, deadline)
+        except RETRYABLE_ERRORS as e:
+            last_error = e
+            continue
+
+        if not is_retryable(response):
+            return response
+        last_response = response
+
+    if last_response is not None:
+        return last_response
+    raise last_error
@@ -1,10 +1,20 @@
-from flask import Blueprint, render_template, request, abort
-from app import limiter
+import os
+import time
+from flask import Blueprint, Response, jsonify, render_template, request, abort
+from app import admission, limiter, shared_state
+from .admission import Saturated
 from .data import get_all_apis, get_api_by_id
+from .cassettes import CassetteMiss
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import metrics
+from .shared_state import api_domain
 from . import api_handlers
 
 bp = Blueprint('main', __name__)
 
+# End-to-end budget (seconds) for one API call, including retries and parsing
+REQUEST_BUDGET = float(os.environ.get('REQUEST_BUDGET', 5))
+
 
 def get_handler(api):
     """
@@ -31,6 +41,75 @@ def get_handler(api):
         return api_handlers.handle_default_api
 
 
+def call_api(api, params, deadline):
+    """
+    Call an API through the shared response cache, upstream health check,
+    admission control and outbound quota, so every replica respects the same
+    limits and no worker runs out of threads for pages.
+
+    In replay mode (UPSTREAM_MODE=replay) the response cache and quota are
+    skipped, so every call exercises the replayed transport.
+
+    Returns:
+        tuple: (result, result_type)
+
+    Raises:
+        DeadlineExceeded: if the request budget runs out
+        Saturated: if no upstream slot frees up in time
+        CassetteMiss: if replaying and nothing was recorded for the call
+    """
+    replaying = not api_handlers.transport.outbound
+    if not replaying:
+        cached = shared_state.get_cached_result(api, params, deadline=deadline)
+        if cached:
+            return cached
+
+    domain = api_domain(api)
+    if not shared_state.is_healthy(domain, deadline=deadline):
+        return "This API is temporarily unavailable. Please try again shortly.", "error"
+
+    with admission.admit(domain, deadline):
+        # Replayed calls never reach the upstream, so they don't use its quota
+        if not replaying and not shared_state.consume_quota(api, deadline=deadline):
+            return "This API's request quota is used up. Please try again later.", "error"
+
+        handler = get_handler(api)
+        started = time.monotonic()
+        try:
+            # Handlers may modify params, so give them a copy; fetch() records
+            # the domain's health as it sees each upstream response
+            result, result_type = handler(api, dict(params), deadline=deadline)
+        finally:
+            metrics.observe('api_looter_upstream_seconds', time.monotonic() - started, {'api': api['id']})
+
+    if not replaying:
+        shared_state.cache_result(api, params, result, result_type, deadline=deadline)
+    return result, result_type
+
+
+def _call_for_display(api, params, deadline):
+    """
+    call_api with failures turned into user-facing error messages.
+
+    Saturated propagates, so the app's handler can answer 503 + Retry-After.
+
+    Returns:
+        tuple: (result, result_type)
+    """
+    try:
+        return call_api(api, params, deadline)
+    except DeadlineExceeded:
+        metrics.inc('api_looter_deadline_exceeded_total', {'api': api['id']})
+        return "The API took too long to respond. Please try again.", "error"
+    except Saturated:
+        raise
+    except CassetteMiss:
+        return "No recorded response for these parameters (UPSTREAM_MODE=replay).", "error"
+    except Exception:
+        # Don't expose internal errors to users
+        return "An error occurred while calling the API. Please try again.", "error"
+
+
 @bp.route('/')
 def index():
     apis = get_all_apis()
@@ -65,13 +144,31 @@ def api_detail(api_id):
                         )
                     params[param["name"]] = value
 
-        # Get handler and call it
-        try:
-            handler = get_handler(api)
-            result, result_type = handler(api, params)
-        except Exception:
-            # Don't expose internal errors to users
-            result = "An error occurred while calling the API. Please try again."
-            result_type = "error"
+        # Call the API (shared cache, health and quota aware) within the request budget
+        deadline = Deadline(REQUEST_BUDGET)
+        result, result_type = _call_for_display(api, params, deadline)
+        metrics.observe('api_looter_budget_remaining_seconds', deadline.remaining(), {'api': api['id']})
+
+        response = Response(render_template('api_detail.html', api=api, result=result, result_type=result_type))
+        response.headers['Server-Timing'] = (
+            f'api;dur={deadline.elapsed() * 1000:.0f}, '
+            f'budget;desc="remaining";dur={deadline.remaining() * 1000:.0f}'
+        )
+        return response
 
     return render_template('api_detail.html', api=api, result=result, result_type=result_type)
+
+
+@bp.route('/health')
+def health():
+    """Liveness check; never touches upstream APIs, so it answers under load"""
+    return jsonify({'status': 'ok'})
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this worker (only when METRICS_TOKEN is set)"""
+    token = os.environ.get('METRICS_TOKEN')
+    if not token or request.headers.get('Authorization') != f'Bearer {token}':
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,253 @@
+"""
+Shared runtime state for scale-out deployments.
+
+Everything backend replicas must agree on lives in one store, so any worker
+on any replica can serve any request. Keys and TTLs:
+
+    api_looter:cache:<api_id>:<params_hash>     response cache, TTL = api['cache_ttl']
+    api_looter:quota:<domain>:<window>          outbound quota, TTL = quota window
+    api_looter:health:<domain>:failures         failure count, TTL = HEALTH_WINDOW
+    api_looter:health:<domain>:down             circuit open, TTL = HEALTH_COOLDOWN
+    api_looter:samples:<api_id>                 payload samples, TTL = SAMPLES_TTL
+
+With REDIS_URL=redis://... the store is Redis; with memory:// it is per
+process (fine for local development). Store errors never fail a request:
+reads count as misses and writes are dropped. After an error the store is
+skipped for STORE_RETRY_INTERVAL seconds, and calls given a deadline skip it
+when less than STORE_TIMEOUT is left, so an unreachable Redis can't eat the
+request budget.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from limits import parse
+
+KEY_PREFIX = 'api_looter'
+
+# Upstream health: this many failures within HEALTH_WINDOW seconds
+# marks a domain down for HEALTH_COOLDOWN seconds
+HEALTH_FAILURE_THRESHOLD = 5
+HEALTH_WINDOW = 60
+HEALTH_COOLDOWN = 30
+
+# Socket timeout of the Redis pool (see app.get_redis_pool), and how long
+# to bypass the store after it fails
+STORE_TIMEOUT = 0.5
+STORE_RETRY_INTERVAL = 5
+
+# Payload profiler samples kept per API
+SAMPLES_MAX = 200
+SAMPLES_TTL = 7 * 24 * 3600
+
+
+class MemoryStore:
+    """In-process key/value store with per-key expiry"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def incr(self, key, ttl):
+        """Increment a counter; the TTL starts with the first increment"""
+        with self._lock:
+            entry = self._live(key)
+            if entry:
+                value, expires_at = entry[0] + 1, entry[1]
+            else:
+                value, expires_at = 1, time.monotonic() + ttl
+            self._data[key] = (value, expires_at)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def push(self, key, value, max_len, ttl):
+        """Prepend to a capped list and refresh its TTL"""
+        with self._lock:
+            entry = self._live(key)
+            items = ([value] + entry[0])[:max_len] if entry else [value]
+            self._data[key] = (items, time.monotonic() + ttl)
+
+    def get_list(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return list(entry[0]) if entry else []
+
+
+class RedisStore:
+    """Redis-backed store sharing the worker's connection pool"""
+
+    def __init__(self, connection_pool):
+        import redis
+        self.redis = redis.Redis(connection_pool=connection_pool)
+        self.errors = (redis.RedisError, OSError)
+
+    def get(self, key):
+        value = self.redis.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.redis.set(key, value, ex=ttl)
+
+    def incr(self, key, ttl):
+        """Increment a counter; the TTL starts with the first increment"""
+        pipe = self.redis.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, ttl, nx=True)
+        value, _ = pipe.execute()
+        return value
+
+    def delete(self, key):
+        self.redis.delete(key)
+
+    def push(self, key, value, max_len, ttl):
+        """Prepend to a capped list and refresh its TTL"""
+        pipe = self.redis.pipeline()
+        pipe.lpush(key, value)
+        pipe.ltrim(key, 0, max_len - 1)
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def get_list(self, key):
+        return [value.decode() for value in self.redis.lrange(key, 0, -1)]
+
+
+def params_hash(params):
+    """Stable short hash of request parameters"""
+    encoded = json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def api_domain(api):
+    """Upstream domain for an API entry"""
+    return urlparse(api.get('endpoint', '')).netloc
+
+
+class SharedState:
+    """Response cache, outbound quotas, upstream health and payload samples over a store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.errors = getattr(store, 'errors', ())
+        self._unavailable_until = 0.0
+
+    def _key(self, *parts):
+        return ':'.join((KEY_PREFIX,) + tuple(str(part) for part in parts))
+
+    def _safely(self, operation, default=None, deadline=None):
+        """
+        Run a store operation, returning default on errors.
+
+        Skipped (returns default) while the store is backing off after an
+        error, or when the deadline has less than STORE_TIMEOUT left.
+        """
+        if time.monotonic() < self._unavailable_until:
+            return default
+        if deadline is not None and deadline.remaining() < STORE_TIMEOUT:
+            return default
+        try:
+            return operation()
+        except self.errors:
+            self._unavailable_until = time.monotonic() + STORE_RETRY_INTERVAL
+            return default
+
+    # Response cache
+
+    def get_cached_result(self, api, params, deadline=None):
+        """Return (result, result_type) if cached, else None"""
+        if not api.get('cache_ttl'):
+            return None
+        key = self._key('cache', api['id'], params_hash(params))
+        cached = self._safely(lambda: self.store.get(key), deadline=deadline)
+        return tuple(json.loads(cached)) if cached else None
+
+    def cache_result(self, api, params, result, result_type, deadline=None):
+        ttl = api.get('cache_ttl')
+        if not ttl or result_type == 'error':
+            return
+        key = self._key('cache', api['id'], params_hash(params))
+        value = json.dumps([result, result_type])
+        self._safely(lambda: self.store.set(key, value, ttl), deadline=deadline)
+
+    # Outbound quotas
+
+    def consume_quota(self, api, deadline=None):
+        """
+        Count one outbound call against the API's quota (e.g. "100 per day").
+
+        Returns:
+            bool: False if the shared quota for this window is used up
+        """
+        quota = api.get('quota')
+        if not quota:
+            return True
+        item = parse(quota)
+        window = item.get_expiry()
+        key = self._key('quota', api_domain(api), int(time.time() // window))
+        count = self._safely(lambda: self.store.incr(key, window), default=0, deadline=deadline)
+        return count <= item.amount
+
+    # Upstream health
+
+    def is_healthy(self, domain, deadline=None):
+        down = self._safely(lambda: self.store.get(self._key('health', domain, 'down')), deadline=deadline)
+        return down is None
+
+    def record_success(self, domain, deadline=None):
+        self._safely(lambda: self.store.delete(self._key('health', domain, 'failures')), deadline=deadline)
+
+    def record_failure(self, domain, deadline=None):
+        failures = self._safely(
+            lambda: self.store.incr(self._key('health', domain, 'failures'), HEALTH_WINDOW),
+            default=0,
+            deadline=deadline,
+        )
+        if failures >= HEALTH_FAILURE_THRESHOLD:
+            self._safely(
+                lambda: self.store.set(self._key('health', domain, 'down'), '1', HEALTH_COOLDOWN),
+                deadline=deadline,
+            )
+
+    # Payload samples
+
+    def record_sample(self, api_id, sample):
+        value = json.dumps(sample)
+        self._safely(lambda: self.store.push(self._key('samples', api_id), value, SAMPLES_MAX, SAMPLES_TTL))
+
+    def get_samples(self, api_id):
+        values = self._safely(lambda: self.store.get_list(self._key('samples', api_id)), default=[])
+        return [json.loads(value) for value in values]
+
+
+def create_shared_state(storage_uri, connection_pool=None):
+    """
+    Build the shared state for a storage URI.
+
+    Args:
+        storage_uri (str): REDIS_URL (redis://, rediss:// or memory://)
+        connection_pool: Redis connection pool to share with the limiter
+    """
+    if connection_pool is not None and storage_uri.startswith(('redis://', 'rediss://')):
+        return SharedState(RedisStore(connection_pool))
+    return SharedState(MemoryStore())
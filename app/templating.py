@@ -0,0 +1,123 @@
+"""
+Template rendering fast path.
+
+- Jinja bytecode cache that can be filled at image build time and read from
+  a read-only filesystem at runtime
+- Per-API fragment cache for the parts of api_detail.html that never change
+  (intro, educational sections, parameter form)
+
+Precompile all templates (run from the project root):
+    flask --app run.py precompile-templates
+"""
+
+import os
+import threading
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.jinja_cache')
+
+
+class ReadOnlySafeBytecodeCache(FileSystemBytecodeCache):
+    """
+    FileSystemBytecodeCache that never fails a render because of the disk.
+
+    In production the container filesystem is read-only, so the cache is
+    populated at build time and misses are simply compiled in memory.
+    """
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+class FragmentCache:
+    """Rendered template fragments keyed by (template name, API id)"""
+
+    def __init__(self):
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = render()
+            with self._lock:
+                self._fragments[key] = fragment
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+
+def get_bytecode_cache(directory=None):
+    """
+    Build the bytecode cache, or None if the directory isn't usable.
+
+    Args:
+        directory (str): Cache directory (defaults to TEMPLATE_CACHE_DIR or .jinja_cache)
+    """
+    directory = directory or os.getenv('TEMPLATE_CACHE_DIR', DEFAULT_CACHE_DIR)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        # Read-only filesystem and the directory wasn't baked into the image
+        if not os.path.isdir(directory):
+            return None
+    return ReadOnlySafeBytecodeCache(directory)
+
+
+def init_templating(app):
+    """
+    Configure the bytecode cache and the `api_fragment` template helper.
+
+    `api_fragment(name, api)` renders `name` once per API and reuses the
+    result, so only the result block of api_detail.html renders per request.
+    Caching is skipped when templates auto-reload (development) or when
+    TEMPLATE_FRAGMENT_CACHE is False.
+    """
+    from flask import render_template
+
+    app.config.setdefault('TEMPLATE_FRAGMENT_CACHE', True)
+
+    cache = get_bytecode_cache()
+    if cache is not None:
+        app.jinja_env.bytecode_cache = cache
+
+    fragments = FragmentCache()
+    app.extensions['template_fragments'] = fragments
+
+    def render_fragment(name, api):
+        # render_template output is already autoescaped HTML (every value from
+        # data.py or the request went through Jinja's escaping), so marking it
+        # safe only stops the including template from escaping it twice
+        return Markup(render_template(name, api=api))  # nosec B704
+
+    def api_fragment(name, api):
+        if app.jinja_env.auto_reload or not app.config['TEMPLATE_FRAGMENT_CACHE']:
+            return render_fragment(name, api)
+        return fragments.get_or_render((name, api['id']), lambda: render_fragment(name, api))
+
+    app.jinja_env.globals['api_fragment'] = api_fragment
+
+    @app.cli.command('precompile-templates')
+    def precompile_templates_command():
+        """Compile all templates into the bytecode cache directory"""
+        if app.jinja_env.bytecode_cache is None:
+            raise SystemExit("Template cache directory is not writable")
+        total = precompile_templates(app)
+        print(f"Precompiled {total} templates into {app.jinja_env.bytecode_cache.directory}")
+
+
+def precompile_templates(app):
+    """Compile every template so its bytecode lands in the cache directory"""
+    count = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+        count += 1
+    return count
+
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Rate limiter cost benchmark.
+
+Compares a rate-limited POST route against an identical unlimited one, for
+each storage URI, using the same limiter configuration as the app. An
+unreachable Redis URL shows the cost of the in-memory fallback path.
+
+Usage (from the project root):
+    python benchmarks/limiter.py [iterations] [storage_uri ...]
+
+    python benchmarks/limiter.py 2000 memory:// redis://localhost:6379/0
+"""
+
+import sys
+import time
+
+from flask import Flask
+
+sys.path.insert(0, '.')
+
+from app import create_limiter  # noqa: E402
+
+DEFAULT_URIS = ['memory://', 'redis://localhost:6379/0']
+
+
+def build_app(storage_uri):
+    """Minimal app with one limited and one unlimited no-op POST route"""
+    app = Flask(__name__)
+    limiter = create_limiter(storage_uri)
+    limiter.init_app(app)
+
+    @app.route('/limited', methods=['POST'])
+    @limiter.limit("1000000 per minute")
+    def limited():
+        return ''
+
+    @app.route('/unlimited', methods=['POST'])
+    def unlimited():
+        return ''
+
+    return app
+
+
+def time_requests(client, path, iterations):
+    """Average microseconds per POST"""
+    for _ in range(200):
+        client.post(path)
+    start = time.perf_counter()
+    for i in range(iterations):
+        # Spread keys like real traffic from many clients
+        client.post(path, environ_overrides={'REMOTE_ADDR': f'10.0.{i % 256}.{i % 200}'})
+    return (time.perf_counter() - start) * 1_000_000 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    uris = sys.argv[2:] or DEFAULT_URIS
+
+    print(f"⏱️  Limiter cost per request ({iterations} iterations)\n")
+    for uri in uris:
+        client = build_app(uri).test_client()
+        base = time_requests(client, '/unlimited', iterations)
+        limited = time_requests(client, '/limited', iterations)
+        print(f"   {uri}")
+        print(f"      unlimited: {base:8.1f} µs/request")
+        print(f"      limited:   {limited:8.1f} µs/request (limiter: {limited - base:+.1f} µs)")
+
+
+if __name__ == '__main__':
+    main()
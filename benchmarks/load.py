@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+HTTP load test.
+
+Hammers one URL (or several replicas in turn) from concurrent threads and
+reports throughput, latency and admission-control 503s. Each thread sends a
+distinct X-Forwarded-For so the per-IP rate limit doesn't cap the run.
+
+Usage (from the project root):
+    python benchmarks/load.py URL [URL ...] [--post key=value ...] [--threads 32] [--duration 30]
+
+Scale-out check, one run per replica count (nginx re-resolves replicas every
+5s; the sleep also covers the new replicas' healthcheck):
+    for n in 1 2 4; do
+        docker-compose -f docker-compose.scale.yml up --build -d --scale backend=$n
+        sleep 20
+        python benchmarks/load.py http://localhost:8080/ --threads 64
+    done
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+
+def worker(urls, form, deadline, thread_id, latencies, errors, shed):
+    session = requests.Session()
+    request_id = 0
+    while time.monotonic() < deadline:
+        request_id += 1
+        url = urls[(thread_id + request_id) % len(urls)]
+        headers = {'X-Forwarded-For': f'10.{thread_id % 256}.{request_id // 256 % 256}.{request_id % 256}'}
+        start = time.perf_counter()
+        try:
+            if form is not None:
+                response = session.post(url, data=form, headers=headers, timeout=30)
+            else:
+                response = session.get(url, headers=headers, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        elapsed = time.perf_counter() - start
+        if status == 503:
+            shed.append(elapsed)
+        elif status is not None and status < 500:
+            latencies.append(elapsed)
+        else:
+            errors.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+', metavar='url', help='One URL per replica, used in turn')
+    parser.add_argument('--post', nargs='*', metavar='KEY=VALUE', help='POST these form fields instead of GET')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    form = dict(field.split('=', 1) for field in args.post) if args.post is not None else None
+    latencies, errors, shed = [], [], []
+    deadline = time.monotonic() + args.duration
+
+    threads = [
+        threading.Thread(target=worker, args=(args.urls, form, deadline, i, latencies, errors, shed))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = len(latencies) + len(errors) + len(shed)
+    print(f"🚀 {', '.join(args.urls)} ({args.threads} threads, {args.duration:.0f}s)")
+    print(f"   requests:   {total} ({len(errors)} errors, {len(shed)} shed with 503)")
+    print(f"   throughput: {len(latencies) / args.duration:.1f} req/s")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"   latency:    p50 {cuts[49] * 1000:.1f} ms, p95 {cuts[94] * 1000:.1f} ms, p99 {cuts[98] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
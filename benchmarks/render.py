@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Template render benchmark.
+
+Measures api_detail.html render time with and without the per-API fragment
+cache, and template load time with a cold vs warm bytecode cache.
+
+Usage (from the project root):
+    python benchmarks/render.py [iterations]
+"""
+
+import json
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+from app import create_app  # noqa: E402
+from app.data import get_api_by_id  # noqa: E402
+from app.templating import ReadOnlySafeBytecodeCache, precompile_templates  # noqa: E402
+
+
+def time_renders(app, api, result, iterations):
+    """Average milliseconds per api_detail.html render"""
+    from flask import render_template
+
+    with app.test_request_context(f"/api/{api['id']}"):
+        render_template('api_detail.html', api=api, result=result, result_type='json')
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render_template('api_detail.html', api=api, result=result, result_type='json')
+        return (time.perf_counter() - start) * 1000 / iterations
+
+
+def time_template_load(cache_dir, warm):
+    """Milliseconds to load every template in a fresh Jinja environment"""
+    app = create_app()
+    app.jinja_env.bytecode_cache = ReadOnlySafeBytecodeCache(cache_dir)
+    if warm:
+        precompile_templates(app)
+        app = create_app()
+        app.jinja_env.bytecode_cache = ReadOnlySafeBytecodeCache(cache_dir)
+    start = time.perf_counter()
+    precompile_templates(app)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    api = get_api_by_id(6)  # CoinGecko - has a parameter form
+    result = json.dumps({"bitcoin": {c: 12345.67 for c in ("usd", "eur", "gbp", "jpy", "aud")}}, indent=2)
+
+    app = create_app()
+    cached = time_renders(app, api, result, iterations)
+
+    app = create_app()
+    app.config['TEMPLATE_FRAGMENT_CACHE'] = False
+    uncached = time_renders(app, api, result, iterations)
+
+    print(f"⏱️  api_detail.html render ({iterations} iterations)")
+    print(f"   fragment cache off: {uncached:.3f} ms/render")
+    print(f"   fragment cache on:  {cached:.3f} ms/render ({uncached / cached:.1f}x)")
+
+    with tempfile.TemporaryDirectory() as cold_dir, tempfile.TemporaryDirectory() as warm_dir:
+        cold = time_template_load(cold_dir, warm=False)
+        warm = time_template_load(warm_dir, warm=True)
+
+    print("\n⏱️  Template load, fresh worker")
+    print(f"   cold bytecode cache: {cold:.2f} ms")
+    print(f"   warm bytecode cache: {warm:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
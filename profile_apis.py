@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+API Payload Profiler - Measures upstream response sizes and shapes
+Run this when adding or tuning APIs in data.py
+
+Usage:
+    python profile_apis.py                     # Call every API live (3 samples each)
+    python profile_apis.py --api 12 --samples 5 --param q="harry potter"
+    python profile_apis.py --recorded          # Use samples recorded at runtime
+                                               # (PAYLOAD_SAMPLE_RATE > 0, from REDIS_URL)
+"""
+
+import argparse
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Profile upstream API payloads")
+    parser.add_argument('--api', type=int, action='append', help="API id to profile (repeatable)")
+    parser.add_argument('--samples', type=int, default=3, help="Live calls per API")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help="Value for text parameters (default: 'test')")
+    parser.add_argument('--recorded', action='store_true', help="Read runtime samples instead of calling APIs")
+    return parser.parse_args()
+
+
+def build_params(api, overrides):
+    """First option for selects, override or 'test' for text fields"""
+    params = {}
+    for param in api.get('parameters', []):
+        if param['name'] in overrides:
+            params[param['name']] = overrides[param['name']]
+        elif param.get('type') == 'select' and param.get('options'):
+            params[param['name']] = param['options'][0]['value']
+        else:
+            params[param['name']] = 'test'
+    return params
+
+
+def collect_live(apis, samples, overrides):
+    """Call each API's handler, sampling every upstream response"""
+    from app import payload_sampler, shared_state
+    from app.api_handlers import transport
+    from app.routes import get_handler
+
+    for api in apis:
+        print(f"  📡 {api['name']}...", end='', flush=True)
+        for _ in range(samples):
+            # Live calls count against the same outbound quota as the app
+            if transport.outbound and not shared_state.consume_quota(api):
+                print(" ⛔ quota used up", end='')
+                break
+            try:
+                get_handler(api)(api, build_params(api, overrides))
+            except Exception as e:
+                print(f" ⚠️  {type(e).__name__}", end='')
+            # Samples are stored in the background; don't let them queue up
+            payload_sampler.flush()
+        print()
+    return {api['id']: payload_sampler.shared_state.get_samples(api['id']) for api in apis}
+
+
+def format_bytes(size):
+    return f"{size / 1024:.1f} KB" if size >= 1024 else f"{size} B"
+
+
+def report(apis, samples_by_api):
+    """Print per-API stats and suggested data.py changes"""
+    from app.profiling import summarize
+
+    suggestions = []
+    print("\n" + "="*60)
+    for api in apis:
+        samples = samples_by_api.get(api['id'])
+        if not samples:
+            print(f"\n⚪ {api['name']} (id {api['id']}): no samples")
+            continue
+
+        summary = summarize(samples)
+        icon = "🔴" if summary['flags'] else "🟢"
+        print(f"\n{icon} {api['name']} (id {api['id']}): {summary['samples']} samples")
+        print(f"   size:  p50 {format_bytes(summary['size_p50'])}, p95 {format_bytes(summary['size_p95'])}, "
+              f"max {format_bytes(summary['size_max'])}, rendered p95 {format_bytes(summary['rendered_p95'])}")
+        if summary['parse_ms_p95'] is not None:
+            print(f"   parse: p50 {summary['parse_ms_p50']:.2f} ms, p95 {summary['parse_ms_p95']:.2f} ms")
+            print(f"   json:  depth {summary['depth_max']}, {summary['shapes']} shape(s)")
+        for flag in summary['flags']:
+            print(f"   ⚠️  {flag}")
+
+        changes = {
+            field: value for field, value in summary['suggestions'].items()
+            if api.get(field) is None
+        }
+        if changes:
+            suggestions.append((api, changes))
+
+    print("\n" + "="*60)
+    if not suggestions:
+        print("\n✅ No data.py changes suggested")
+        return
+
+    print("\n📝 Suggested data.py fields:")
+    for api, changes in suggestions:
+        fields = ", ".join(f'"{field}": {value}' for field, value in changes.items())
+        print(f"   {api['name']} (id {api['id']}): {fields}")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    sys.path.insert(0, '.')
+    from app.data import APIS
+
+    if not args.recorded:
+        # Sample every live call into a private in-memory store; quotas
+        # still go through REDIS_URL so other replicas see these calls
+        from app import payload_sampler
+        from app.shared_state import MemoryStore, SharedState
+        payload_sampler.rate = 1
+        payload_sampler.shared_state = SharedState(MemoryStore())
+
+    apis = [api for api in APIS if not args.api or api['id'] in args.api]
+    print("📏 API Payload Profiler\n")
+
+    if args.recorded:
+        from app import shared_state
+        samples_by_api = {api['id']: shared_state.get_samples(api['id']) for api in apis}
+    else:
+        overrides = dict(param.split('=', 1) for param in args.param)
+        print(f"Calling {len(apis)} APIs ({args.samples} samples each)")
+        samples_by_api = collect_live(apis, args.samples, overrides)
+
+    report(apis, samples_by_api)
@@ -0,0 +1,92 @@
+"""
+Tests for routes.call_api: upstream health as seen through the whole call path.
+
+Run from the project root:
+    python -m pytest tests
+"""
+
+import pytest
+import requests
+
+from app import api_handlers, routes
+from app.cassettes import CassetteMiss
+from app.data import get_api_by_id
+from app.deadline import Deadline, DeadlineExceeded
+from app.shared_state import HEALTH_FAILURE_THRESHOLD, MemoryStore, SharedState, api_domain
+
+# Kanye Rest: no cache_ttl, quota or retry policy, so each call is one upstream GET
+API = get_api_by_id(13)
+DOMAIN = api_domain(API)
+
+
+def make_response(status, body=b'{"quote": "test"}'):
+    response = requests.Response()
+    response.status_code = status
+    response.headers['Content-Type'] = 'application/json'
+    response._content = body
+    return response
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = SharedState(MemoryStore())
+    monkeypatch.setattr(routes, 'shared_state', state)
+    monkeypatch.setattr(api_handlers, 'shared_state', state)
+    return state
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Replace the network with a list of responses/exceptions, served in order"""
+    replies = []
+
+    def live_get(url, params, deadline):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(api_handlers.transport, 'live_get', live_get)
+    monkeypatch.setattr(api_handlers.transport, 'mode', 'live')
+    return replies
+
+
+def test_server_errors_open_the_circuit(state, upstream):
+    upstream.extend(make_response(503) for _ in range(HEALTH_FAILURE_THRESHOLD))
+    for _ in range(HEALTH_FAILURE_THRESHOLD):
+        routes.call_api(API, {}, Deadline(5))
+
+    assert not state.is_healthy(DOMAIN)
+    result, result_type = routes.call_api(API, {}, Deadline(5))
+    assert result_type == 'error' and 'temporarily unavailable' in result
+
+
+def test_timeouts_open_the_circuit_with_no_budget_left(state, upstream):
+    upstream.extend(DeadlineExceeded('stalled') for _ in range(HEALTH_FAILURE_THRESHOLD))
+    for _ in range(HEALTH_FAILURE_THRESHOLD):
+        with pytest.raises(DeadlineExceeded):
+            routes.call_api(API, {}, Deadline(0.01))
+
+    assert not state.is_healthy(DOMAIN)
+
+
+def test_success_resets_failures(state, upstream):
+    upstream.extend([requests.ConnectionError()] * (HEALTH_FAILURE_THRESHOLD - 1))
+    upstream.append(make_response(200))
+    upstream.append(requests.ConnectionError())
+    for _ in range(HEALTH_FAILURE_THRESHOLD + 1):
+        try:
+            routes.call_api(API, {}, Deadline(5))
+        except requests.ConnectionError:
+            pass
+
+    assert state.is_healthy(DOMAIN)
+
+
+def test_cassette_misses_dont_count(state, upstream):
+    upstream.extend(CassetteMiss('not recorded') for _ in range(HEALTH_FAILURE_THRESHOLD))
+    for _ in range(HEALTH_FAILURE_THRESHOLD):
+        with pytest.raises(CassetteMiss):
+            routes.call_api(API, {}, Deadline(5))
+
+    assert state.is_healthy(DOMAIN)
@@ -0,0 +1,60 @@
+"""
+Tests for app/profiling.py.
+
+Run from the project root:
+    python -m pytest tests
+"""
+
+import threading
+
+import requests
+
+from app.profiling import DEFAULT_MAX_BYTES, PayloadSampler, profile_response, summarize
+from app.shared_state import MemoryStore, SharedState
+
+API = {'id': 1}
+
+
+def make_response(body):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json'
+    response._content = body
+    return response
+
+
+class BlockingState:
+    """Shared state whose record_sample waits until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.samples = []
+
+    def record_sample(self, api_id, sample):
+        self.release.wait(5)
+        self.samples.append(sample)
+
+
+def test_rendered_size_is_what_the_page_shows():
+    compact = b'[' + b','.join(b'{"id":%d}' % i for i in range(4_000)) + b']'
+    sample = profile_response(make_response(compact))
+    assert sample['size'] < DEFAULT_MAX_BYTES < sample['rendered_size']
+    assert 'truncated' in summarize([sample])['flags'][0]
+
+
+def test_sampler_stores_samples_off_the_request_thread():
+    state = SharedState(MemoryStore())
+    sampler = PayloadSampler(1, state)
+    sampler.maybe_sample(API, make_response(b'{"a": 1}'))
+    sampler.flush()
+    assert len(state.get_samples(API['id'])) == 1
+
+
+def test_sampler_drops_samples_while_backed_up():
+    state = BlockingState()
+    sampler = PayloadSampler(1, state)
+    for _ in range(PayloadSampler.MAX_PENDING + 5):
+        sampler.maybe_sample(API, make_response(b'{"a": 1}'))
+    state.release.set()
+    sampler.flush()
+    assert len(state.samples) == PayloadSampler.MAX_PENDING
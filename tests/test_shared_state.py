@@ -0,0 +1,275 @@
+"""
+Tests for app/shared_state.py.
+
+Run from the project root:
+    pip install pytest fakeredis
+    python -m pytest tests
+"""
+
+import importlib
+
+import pytest
+
+from app.deadline import Deadline
+from app.shared_state import (
+    HEALTH_COOLDOWN,
+    HEALTH_FAILURE_THRESHOLD,
+    HEALTH_WINDOW,
+    STORE_RETRY_INTERVAL,
+    MemoryStore,
+    RedisStore,
+    SharedState,
+    create_shared_state,
+)
+
+# `app.shared_state` is also the name of the app's SharedState instance
+shared_state_module = importlib.import_module('app.shared_state')
+
+API = {'id': 1, 'endpoint': 'https://api.example.com/v1', 'cache_ttl': 60, 'quota': '3 per minute'}
+DOMAIN = 'api.example.com'
+
+
+class FakeClock:
+    """Stands in for the time module so TTLs and windows can be skipped through"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(shared_state_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def redis_store(fake_redis):
+    return RedisStore(fake_redis.connection_pool)
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def state(request, clock):
+    if request.param == 'memory':
+        return SharedState(MemoryStore())
+    return SharedState(request.getfixturevalue('redis_store'))
+
+
+class BrokenStore:
+    """Store whose every call fails like an unreachable Redis"""
+
+    errors = (OSError,)
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            self.calls += 1
+            raise OSError('connection timed out')
+        return fail
+
+
+# MemoryStore
+
+def test_memory_store_expires_keys(clock):
+    store = MemoryStore()
+    store.set('key', 'value', ttl=10)
+    clock.advance(9)
+    assert store.get('key') == 'value'
+    clock.advance(1)
+    assert store.get('key') is None
+
+
+def test_memory_store_incr_ttl_starts_with_first_increment(clock):
+    store = MemoryStore()
+    assert store.incr('counter', ttl=10) == 1
+    clock.advance(6)
+    assert store.incr('counter', ttl=10) == 2
+    clock.advance(4)
+    assert store.incr('counter', ttl=10) == 1
+
+
+def test_memory_store_push_caps_list_and_refreshes_ttl(clock):
+    store = MemoryStore()
+    for value in range(5):
+        store.push('list', value, max_len=3, ttl=10)
+        clock.advance(6)
+    assert store.get_list('list') == [4, 3, 2]
+    clock.advance(4)
+    assert store.get_list('list') == []
+
+
+# RedisStore
+
+def test_redis_store_sets_ttls(redis_store, fake_redis):
+    redis_store.set('key', 'value', ttl=30)
+    assert redis_store.get('key') == 'value'
+    assert 0 < fake_redis.ttl('key') <= 30
+
+
+def test_redis_store_incr_keeps_first_ttl(redis_store, fake_redis):
+    assert redis_store.incr('counter', ttl=30) == 1
+    fake_redis.expire('counter', 5)
+    assert redis_store.incr('counter', ttl=30) == 2
+    assert fake_redis.ttl('counter') <= 5
+
+
+def test_redis_store_push_caps_list(redis_store, fake_redis):
+    for value in range(5):
+        redis_store.push('list', str(value), max_len=3, ttl=30)
+    assert redis_store.get_list('list') == ['4', '3', '2']
+    assert 0 < fake_redis.ttl('list') <= 30
+
+
+# Response cache
+
+def test_cache_round_trip(state):
+    assert state.get_cached_result(API, {'q': 'x'}) is None
+    state.cache_result(API, {'q': 'x'}, 'hello', 'json')
+    assert state.get_cached_result(API, {'q': 'x'}) == ('hello', 'json')
+    assert state.get_cached_result(API, {'q': 'y'}) is None
+
+
+def test_cache_skips_errors_and_uncached_apis(state):
+    state.cache_result(API, {}, 'boom', 'error')
+    assert state.get_cached_result(API, {}) is None
+
+    uncached = dict(API, cache_ttl=None)
+    state.cache_result(uncached, {}, 'hello', 'json')
+    assert state.get_cached_result(uncached, {}) is None
+
+
+def test_memory_cache_expires_after_cache_ttl(clock):
+    state = SharedState(MemoryStore())
+    state.cache_result(API, {}, 'hello', 'json')
+    clock.advance(API['cache_ttl'])
+    assert state.get_cached_result(API, {}) is None
+
+
+# Outbound quotas
+
+def test_quota_allows_amount_per_window(state):
+    assert [state.consume_quota(API) for _ in range(4)] == [True, True, True, False]
+
+
+def test_quota_resets_in_next_window(clock):
+    state = SharedState(MemoryStore())
+    for _ in range(3):
+        state.consume_quota(API)
+    assert not state.consume_quota(API)
+    clock.advance(60)
+    assert state.consume_quota(API)
+
+
+def test_quota_is_shared_between_replicas(redis_store):
+    replica_a, replica_b = SharedState(redis_store), SharedState(redis_store)
+    assert replica_a.consume_quota(API)
+    assert replica_b.consume_quota(API)
+    assert replica_a.consume_quota(API)
+    assert not replica_b.consume_quota(API)
+
+
+def test_no_quota_is_unlimited(state):
+    assert all(state.consume_quota(dict(API, quota=None)) for _ in range(10))
+
+
+# Upstream health
+
+def test_circuit_opens_after_threshold_failures(state):
+    for _ in range(HEALTH_FAILURE_THRESHOLD - 1):
+        state.record_failure(DOMAIN)
+    assert state.is_healthy(DOMAIN)
+    state.record_failure(DOMAIN)
+    assert not state.is_healthy(DOMAIN)
+
+
+def test_success_resets_failure_count(state):
+    for _ in range(HEALTH_FAILURE_THRESHOLD - 1):
+        state.record_failure(DOMAIN)
+    state.record_success(DOMAIN)
+    state.record_failure(DOMAIN)
+    assert state.is_healthy(DOMAIN)
+
+
+def test_circuit_closes_after_cooldown(clock):
+    state = SharedState(MemoryStore())
+    for _ in range(HEALTH_FAILURE_THRESHOLD):
+        state.record_failure(DOMAIN)
+    clock.advance(HEALTH_COOLDOWN - 1)
+    assert not state.is_healthy(DOMAIN)
+    clock.advance(1)
+    assert state.is_healthy(DOMAIN)
+
+
+def test_failures_outside_window_dont_open_circuit(clock):
+    state = SharedState(MemoryStore())
+    for _ in range(HEALTH_FAILURE_THRESHOLD - 1):
+        state.record_failure(DOMAIN)
+    clock.advance(HEALTH_WINDOW)
+    state.record_failure(DOMAIN)
+    assert state.is_healthy(DOMAIN)
+
+
+def test_open_circuit_has_cooldown_ttl_in_redis(redis_store, fake_redis):
+    state = SharedState(redis_store)
+    for _ in range(HEALTH_FAILURE_THRESHOLD):
+        state.record_failure(DOMAIN)
+    assert 0 < fake_redis.ttl(f'api_looter:health:{DOMAIN}:down') <= HEALTH_COOLDOWN
+
+
+# Store failures
+
+def test_store_errors_never_fail_requests(clock):
+    state = SharedState(BrokenStore())
+    assert state.get_cached_result(API, {}) is None
+    assert state.is_healthy(DOMAIN)
+    assert state.consume_quota(API)
+    state.record_failure(DOMAIN)
+    state.cache_result(API, {}, 'hello', 'json')
+
+
+def test_store_is_skipped_after_an_error(clock):
+    store = BrokenStore()
+    state = SharedState(store)
+    state.get_cached_result(API, {})
+    state.is_healthy(DOMAIN)
+    state.consume_quota(API)
+    assert store.calls == 1
+
+    clock.advance(STORE_RETRY_INTERVAL)
+    state.is_healthy(DOMAIN)
+    assert store.calls == 2
+
+
+def test_store_is_skipped_when_deadline_is_close():
+    store = BrokenStore()
+    state = SharedState(store)
+    assert state.is_healthy(DOMAIN, deadline=Deadline(0.1))
+    assert state.consume_quota(API, deadline=Deadline(0.1))
+    assert store.calls == 0
+
+
+def test_create_shared_state_picks_store():
+    assert isinstance(create_shared_state('memory://').store, MemoryStore)
+    assert isinstance(create_shared_state('redis://localhost:6379', connection_pool=None).store, MemoryStore)
+
+
+def test_params_hash_is_order_independent():
+    assert shared_state_module.params_hash({'a': 1, 'b': 2}) == shared_state_module.params_hash({'b': 2, 'a': 1})
+    assert len(shared_state_module.params_hash(None)) == 16
@@ -150,6 +150,38 @@ def validate_apis():  # noqa: C901
                 if keyword in value:
                     errors.append(f"❌ {api_name}: Suspicious content in '{field}': {keyword}")
 
+        # 11. Validate optional cache/quota/size/retry settings
+        cache_ttl = api.get('cache_ttl')
+        if cache_ttl is not None and (not isinstance(cache_ttl, int) or cache_ttl < 0):
+            errors.append(f"❌ {api_name}: 'cache_ttl' must be a non-negative integer (seconds)")
+
+        max_bytes = api.get('max_bytes')
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes <= 0):
+            errors.append(f"❌ {api_name}: 'max_bytes' must be a positive integer")
+
+        retry = api.get('retry')
+        if retry is not None:
+            if not isinstance(retry, dict) or set(retry) - {'attempts', 'backoff', 'hedge'}:
+                errors.append(f"❌ {api_name}: 'retry' must be a dict of attempts/backoff/hedge")
+            else:
+                # Defaults match RetryPolicy; bools are ints in Python, so rule them out
+                attempts = retry.get('attempts', 1)
+                backoff = retry.get('backoff', 0.1)
+                if isinstance(attempts, bool) or not isinstance(attempts, int) or not 1 <= attempts <= 5:
+                    errors.append(f"❌ {api_name}: 'retry' attempts must be between 1 and 5")
+                if isinstance(backoff, bool) or not isinstance(backoff, (int, float)) or backoff < 0:
+                    errors.append(f"❌ {api_name}: 'retry' backoff must be a non-negative number (seconds)")
+                if not isinstance(retry.get('hedge', False), bool):
+                    errors.append(f"❌ {api_name}: 'retry' hedge must be True or False")
+
+        quota = api.get('quota')
+        if quota is not None:
+            try:
+                from limits import parse
+                parse(quota)
+            except ValueError:
+                errors.append(f"❌ {api_name}: Invalid 'quota' '{quota}' (e.g. '100 per day')")
+
     # Print results
     print("\n" + "="*60)
     if warnings: